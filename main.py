@@ -1,18 +1,44 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import atexit
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from contextlib import asynccontextmanager, contextmanager
 import logging
-import json
-from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+import queue
+from datetime import date, datetime
 from pathlib import Path
 import re
 import os
+import threading
+import time
+from types import MappingProxyType
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+import numpy as np
 import pandas as pd
-import base64
+from pandas.io.parsers import TextParser
+try:
+    # Rust xlsx/xls reader; without it workbooks are read by pandas' default engine
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+try:
+    # SIMD-accelerated, drop-in replacement for the stdlib decoder
+    import pybase64 as base64
+except ImportError:
+    import base64
+import csv
+import hashlib
 import io
+from itertools import groupby
+import orjson
 
 # Load environment variables
 load_dotenv()
@@ -33,9 +59,18 @@ console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(level
 if sys.stdout.encoding != 'utf-8':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
+# Log calls only enqueue the record; a listener thread does the file/console I/O
+log_queue = queue.SimpleQueue()
+queue_handler = QueueHandler(log_queue)
+# Leave timestamp/level formatting to the file and console handlers
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
-    handlers=[file_handler, console_handler]
+    handlers=[queue_handler]
 )
 
 logger = logging.getLogger(__name__)
@@ -49,17 +84,86 @@ DB_CONFIG = {
     'admin_db': os.getenv('POSTGRES_ADMIN_DB', 'postgres')
 }
 
+# Clinic name is the plus-address tag of the recipient, sanitized for use
+# as a database name
+CLINIC_NAME_RE = re.compile(r'\+([^@]+)@')
+DB_NAME_UNSAFE_RE = re.compile(r'[^a-z0-9_]')
+
+# Connections are pooled per database and reused across requests. A pool keeps
+# at most DB_POOL_MIN_CONN idle connections (extras are closed when returned),
+# and at most DB_POOL_MAX_POOLS pools stay open per worker: past that, the least
+# recently used pools with no borrowed connections are closed. See the
+# WEB_CONCURRENCY default at the bottom of this file for the connection budget
+DB_POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN_CONN', '1'))
+DB_POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX_CONN', '10'))
+DB_POOL_MAX_POOLS = int(os.getenv('DB_POOL_MAX_POOLS', '4'))
+# Database name -> (pool, semaphore), least recently used first, and the number
+# of callers currently borrowing from each pool
+connection_pools = OrderedDict()
+pool_borrowers = Counter()
+connection_pools_lock = threading.Lock()
+
+# Databases and (database, table) pairs already created or verified by this
+# process; their existence checks and DDL are skipped until an error occurs
+ready_databases = set()
+ready_tables = set()
+ready_lock = threading.Lock()
+
+# Channel notified (payload: database name) on the admin database whenever a
+# clinic database is created, so readers can refresh cached clinic lists
+CLINIC_CREATED_CHANNEL = 'clinic_created'
+
+# Attachment parsing and storage run on their own threads, so threads waiting
+# on the database never hold up the default executor (used by the email writer)
+ATTACHMENT_WORKERS = int(os.getenv('ATTACHMENT_WORKERS', str(DB_POOL_MAX_CONN)))
+attachment_executor = ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS, thread_name_prefix='attachment')
+
+# Upsert batching: rows per INSERT statement for execute_values, and the
+# batch size from which rows are COPYed into a staging table instead
+UPSERT_PAGE_SIZE = int(os.getenv('UPSERT_PAGE_SIZE', '1000'))
+COPY_UPSERT_MIN_ROWS = int(os.getenv('COPY_UPSERT_MIN_ROWS', '1000'))
+# Batches at least this large (and at least half the table) are loaded with
+# the secondary indexes dropped and rebuilt afterwards
+BULK_LOAD_MIN_ROWS = int(os.getenv('BULK_LOAD_MIN_ROWS', '5000'))
+
+# Parsed Excel attachments are cached on disk, keyed by content hash, so
+# re-sent reports skip parsing; XLSX_CACHE_MAX_BYTES=0 disables the cache
+XLSX_CACHE_DIR = Path(os.getenv('XLSX_CACHE_DIR', '.xlsx_cache'))
+XLSX_CACHE_MAX_BYTES = int(os.getenv('XLSX_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Full tracebacks logged per second for failed webhooks; the rest log one line
+ERROR_TRACEBACKS_PER_SECOND = float(os.getenv('ERROR_TRACEBACKS_PER_SECOND', '5'))
+
+# Upper bound on how much of a declared Content-Length is allocated up front
+MAX_BODY_PREALLOCATION = 64 * 1024 * 1024
+
+# Received emails are appended to a daily JSONL file by a background task
+EMAILS_DIR = Path('emails')
+EMAIL_QUEUE_SIZE = int(os.getenv('EMAIL_QUEUE_SIZE', '1000'))
+EMAIL_WRITE_BATCH_SIZE = int(os.getenv('EMAIL_WRITE_BATCH_SIZE', '64'))
+# EMAIL_LOG_ATTACHMENT_DATA=false records attachment sizes (data_len) instead
+# of their base64 data, keeping the daily files small
+EMAIL_LOG_ATTACHMENT_DATA = os.getenv('EMAIL_LOG_ATTACHMENT_DATA', 'true').lower() not in ('0', 'false', 'no')
 
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the stdlib json module"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=str)
+
+
+@lru_cache(maxsize=1024)
 def extract_clinic_name(email_address: str) -> str:
     """
     Extract clinic name from email address between + and @
     Example: developers.mxd+supertest@gmail.com -> supertest
     """
-    match = re.search(r'\+([^@]+)@', email_address)
+    match = CLINIC_NAME_RE.search(email_address)
     if match:
         clinic_name = match.group(1).lower()
         # Sanitize database name (only alphanumeric and underscore)
-        clinic_name = re.sub(r'[^a-z0-9_]', '_', clinic_name)
+        clinic_name = DB_NAME_UNSAFE_RE.sub('_', clinic_name)
         return clinic_name
     return None
 
@@ -87,224 +191,496 @@ def extract_table_name(filename: str) -> str:
         return table_name
 
 
-def get_db_connection(database_name: str = None):
-    """Get a connection to the specified database or admin database"""
+def get_connection_pool(database_name: str = None):
+    """
+    Get (creating on first use) the connection pool for a database
+    The caller counts as a borrower, so the pool can't be evicted, until it
+    calls release_connection_pool
+    """
     db = database_name or DB_CONFIG['admin_db']
-    return psycopg2.connect(
-        host=DB_CONFIG['host'],
-        port=DB_CONFIG['port'],
-        user=DB_CONFIG['user'],
-        password=DB_CONFIG['password'],
-        database=db
-    )
+    with connection_pools_lock:
+        entry = connection_pools.get(db)
+        if entry is None:
+            pool = ThreadedConnectionPool(
+                DB_POOL_MIN_CONN,
+                DB_POOL_MAX_CONN,
+                host=DB_CONFIG['host'],
+                port=DB_CONFIG['port'],
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'],
+                database=db
+            )
+            # ThreadedConnectionPool raises when exhausted; the semaphore
+            # makes callers wait for a free connection instead
+            entry = (pool, threading.BoundedSemaphore(DB_POOL_MAX_CONN))
+            connection_pools[db] = entry
+        else:
+            connection_pools.move_to_end(db)
+        pool_borrowers[db] += 1
+        evict_idle_pools()
+    return entry
 
 
-def database_exists(database_name: str) -> bool:
-    """Check if database exists"""
+def release_connection_pool(database_name: str = None):
+    """Stop counting a caller of get_connection_pool as a borrower"""
+    db = database_name or DB_CONFIG['admin_db']
+    with connection_pools_lock:
+        pool_borrowers[db] -= 1
+        if not pool_borrowers[db]:
+            del pool_borrowers[db]
+        evict_idle_pools()
+
+
+def evict_idle_pools():
+    """Close least recently used pools nobody is borrowing from while over DB_POOL_MAX_POOLS (lock held)"""
+    for db in list(connection_pools):
+        if len(connection_pools) <= DB_POOL_MAX_POOLS:
+            break
+        if not pool_borrowers[db]:
+            pool, _ = connection_pools.pop(db)
+            pool.closeall()
+            del pool_borrowers[db]
+
+
+def close_connection_pools():
+    """Close every pooled connection"""
+    with connection_pools_lock:
+        for pool, _ in connection_pools.values():
+            pool.closeall()
+        connection_pools.clear()
+        pool_borrowers.clear()
+
+
+atexit.register(close_connection_pools)
+
+
+def ping_connection(conn) -> bool:
+    """Check that a pooled connection is still usable"""
+    if conn.closed:
+        return False
     try:
-        conn = get_db_connection()
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT 1 FROM pg_database WHERE datname = %s",
-            (database_name,)
-        )
-        exists = cursor.fetchone() is not None
-        
-        cursor.close()
-        conn.close()
-        return exists
-    except Exception as e:
-        logger.error(f"Error checking database existence: {e}")
+        # Autocommit so the ping doesn't leave a transaction open
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.autocommit = False
+        return True
+    except psycopg2.Error:
         return False
 
 
+@contextmanager
+def db_conn(database_name: str = None):
+    """
+    Borrow a pooled connection to the specified database or admin database
+    Yields (conn, cursor); the connection is rolled back and returned on exit
+    """
+    pool, slots = get_connection_pool(database_name)
+    slots.acquire()
+    try:
+        conn = pool.getconn()
+        if not ping_connection(conn):
+            # Stale connection (server restart, idle timeout): replace it
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                yield conn, cursor
+        finally:
+            discard = conn.closed
+            if not discard:
+                try:
+                    conn.rollback()
+                    conn.autocommit = False
+                except psycopg2.Error:
+                    discard = True
+            pool.putconn(conn, close=discard)
+    finally:
+        slots.release()
+        release_connection_pool(database_name)
+
+
+def mark_ready(database_name: str, table_name: str = None):
+    """Remember that a database (or a table in it) exists"""
+    with ready_lock:
+        if table_name:
+            ready_tables.add((database_name, table_name))
+        else:
+            ready_databases.add(database_name)
+
+
+def forget_ready(database_name: str):
+    """Re-verify a database and its tables on next use (e.g. after a DB error)"""
+    with ready_lock:
+        ready_databases.discard(database_name)
+        ready_tables.difference_update(
+            [key for key in ready_tables if key[0] == database_name]
+        )
+
+
+def database_exists(cursor, database_name: str) -> bool:
+    """Check if database exists, using a cursor on the admin database"""
+    cursor.execute(
+        "SELECT 1 FROM pg_database WHERE datname = %s",
+        (database_name,)
+    )
+    return cursor.fetchone() is not None
+
+
 def create_database(database_name: str):
     """Create a new database if it doesn't exist"""
+    if database_name in ready_databases:
+        return True
     try:
-        if database_exists(database_name):
-            logger.info(f"Database '{database_name}' already exists")
-            return True
-        
-        conn = get_db_connection()
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cursor = conn.cursor()
-        
-        # Create database
-        cursor.execute(f'CREATE DATABASE {database_name}')
-        logger.info(f"Database '{database_name}' created successfully")
-        
-        cursor.close()
-        conn.close()
+        # Check and create on one connection; CREATE DATABASE cannot run
+        # inside a transaction block
+        with db_conn() as (conn, cursor):
+            conn.autocommit = True
+            if database_exists(cursor, database_name):
+                logger.info(f"Database '{database_name}' already exists")
+            else:
+                try:
+                    cursor.execute(f'CREATE DATABASE {database_name}')
+                    logger.info(f"Database '{database_name}' created successfully")
+                    cursor.execute("SELECT pg_notify(%s, %s)", (CLINIC_CREATED_CHANNEL, database_name))
+                except (psycopg2.errors.DuplicateDatabase, psycopg2.errors.UniqueViolation):
+                    # Another worker created it between the check and CREATE
+                    logger.info(f"Database '{database_name}' already exists")
+        mark_ready(database_name)
         return True
     except Exception as e:
         logger.error(f"Error creating database: {e}")
         return False
 
 
-def create_appointments_table(database_name: str):
-    """Create appointments table in the specified database"""
-    try:
-        conn = get_db_connection(database_name)
-        cursor = conn.cursor()
-        
-        # Create appointments table with schema matching Excel structure
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS appointments (
-            id SERIAL PRIMARY KEY,
-            appointment_date TIMESTAMP,
-            client VARCHAR(255),
-            appointment_type VARCHAR(255),
-            profession VARCHAR(255),
-            client_duration NUMERIC,
-            practitioner VARCHAR(255),
-            business VARCHAR(255),
-            appointment_status VARCHAR(100),
-            column_number NUMERIC,
-            billed_status VARCHAR(100),
-            clinical_note TEXT,
-            client_id BIGINT,
-            appointment_id BIGINT UNIQUE,
-            address_1 VARCHAR(255),
-            address_2 VARCHAR(255),
-            address_3 VARCHAR(255),
-            address_4 VARCHAR(255),
-            suburb VARCHAR(100),
-            state VARCHAR(100),
-            postcode VARCHAR(20),
-            country VARCHAR(100),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        
-        cursor.execute(create_table_query)
-        
-        # Create indexes for common queries
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_appointments_date 
-            ON appointments(appointment_date)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_appointments_client_id 
-            ON appointments(client_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_appointments_appointment_id 
-            ON appointments(appointment_id)
-        """)
-        
-        conn.commit()
-        logger.info(f"Appointments table created successfully in database '{database_name}'")
-        
-        cursor.close()
-        conn.close()
-        return True
-    except Exception as e:
-        logger.error(f"Error creating appointments table: {e}")
+def create_appointments_table(cursor, database_name: str) -> bool:
+    """
+    Create appointments table in the specified database, in the caller's transaction
+    Returns False without touching the database if the table is known to exist
+    """
+    if (database_name, 'appointments') in ready_tables:
         return False
+    
+    # Create appointments table with schema matching Excel structure, plus
+    # indexes for common queries, in a single round trip
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS appointments (
+        id SERIAL PRIMARY KEY,
+        appointment_date TIMESTAMP,
+        client VARCHAR(255),
+        appointment_type VARCHAR(255),
+        profession VARCHAR(255),
+        client_duration NUMERIC,
+        practitioner VARCHAR(255),
+        business VARCHAR(255),
+        appointment_status VARCHAR(100),
+        column_number NUMERIC,
+        billed_status VARCHAR(100),
+        clinical_note TEXT,
+        client_id BIGINT,
+        appointment_id BIGINT UNIQUE,
+        address_1 VARCHAR(255),
+        address_2 VARCHAR(255),
+        address_3 VARCHAR(255),
+        address_4 VARCHAR(255),
+        suburb VARCHAR(100),
+        state VARCHAR(100),
+        postcode VARCHAR(20),
+        country VARCHAR(100),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(appointment_date);
+    CREATE INDEX IF NOT EXISTS idx_appointments_client_id ON appointments(client_id);
+    CREATE INDEX IF NOT EXISTS idx_appointments_appointment_id ON appointments(appointment_id);
+    """
+    
+    cursor.execute(create_table_query)
+    return True
 
 
-def create_clients_table(database_name: str):
-    """Create clients table in the specified database"""
+def create_clients_table(cursor, database_name: str) -> bool:
+    """
+    Create clients table in the specified database, in the caller's transaction
+    Returns False without touching the database if the table is known to exist
+    """
+    if (database_name, 'clients') in ready_tables:
+        return False
+    
+    # Create clients table with schema matching Excel structure, plus
+    # indexes for common queries, in a single round trip
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS clients (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(50),
+        first_name VARCHAR(255),
+        preferred_name VARCHAR(255),
+        middle VARCHAR(255),
+        surname VARCHAR(255),
+        date_of_birth VARCHAR(50),
+        address_line_1 VARCHAR(255),
+        address_line_2 VARCHAR(255),
+        address_line_3 VARCHAR(255),
+        address_line_4 VARCHAR(255),
+        country VARCHAR(100),
+        state VARCHAR(100),
+        suburb VARCHAR(100),
+        postcode VARCHAR(20),
+        preferred_phone VARCHAR(50),
+        work_phone VARCHAR(50),
+        home_phone VARCHAR(50),
+        mobile VARCHAR(50),
+        fax VARCHAR(50),
+        email VARCHAR(255),
+        file_no BIGINT,
+        gender VARCHAR(50),
+        pronouns VARCHAR(50),
+        sex VARCHAR(50),
+        archived VARCHAR(10),
+        notes TEXT,
+        warnings TEXT,
+        fee_category VARCHAR(255),
+        practitioner VARCHAR(255),
+        medicare_no VARCHAR(50),
+        medicare_irn VARCHAR(50),
+        medicare_expiry VARCHAR(50),
+        dva_no VARCHAR(50),
+        dva_type VARCHAR(50),
+        concession_no VARCHAR(50),
+        concession_expiry VARCHAR(50),
+        health_fund VARCHAR(255),
+        health_fund_member_no VARCHAR(50),
+        ndis_no VARCHAR(50),
+        created_date TIMESTAMP,
+        consent_date TIMESTAMP,
+        privacy_policy_date TIMESTAMP,
+        client_id BIGINT UNIQUE,
+        gp_name VARCHAR(255),
+        db_created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        db_updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_clients_client_id ON clients(client_id);
+    CREATE INDEX IF NOT EXISTS idx_clients_email ON clients(email);
+    CREATE INDEX IF NOT EXISTS idx_clients_surname ON clients(surname);
+    """
+    
+    cursor.execute(create_table_query)
+    return True
+
+
+def ensure_report_table(conn, cursor, create_table, database_name: str, table_name: str) -> bool:
+    """
+    Create a report table on first use and commit it in its own short transaction,
+    so a failed upsert never has to redo it
+    Returns True if this call ran the DDL
+    """
     try:
-        conn = get_db_connection(database_name)
-        cursor = conn.cursor()
-        
-        # Create clients table with schema matching Excel structure
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS clients (
-            id SERIAL PRIMARY KEY,
-            title VARCHAR(50),
-            first_name VARCHAR(255),
-            preferred_name VARCHAR(255),
-            middle VARCHAR(255),
-            surname VARCHAR(255),
-            date_of_birth VARCHAR(50),
-            address_line_1 VARCHAR(255),
-            address_line_2 VARCHAR(255),
-            address_line_3 VARCHAR(255),
-            address_line_4 VARCHAR(255),
-            country VARCHAR(100),
-            state VARCHAR(100),
-            suburb VARCHAR(100),
-            postcode VARCHAR(20),
-            preferred_phone VARCHAR(50),
-            work_phone VARCHAR(50),
-            home_phone VARCHAR(50),
-            mobile VARCHAR(50),
-            fax VARCHAR(50),
-            email VARCHAR(255),
-            file_no BIGINT,
-            gender VARCHAR(50),
-            pronouns VARCHAR(50),
-            sex VARCHAR(50),
-            archived VARCHAR(10),
-            notes TEXT,
-            warnings TEXT,
-            fee_category VARCHAR(255),
-            practitioner VARCHAR(255),
-            medicare_no VARCHAR(50),
-            medicare_irn VARCHAR(50),
-            medicare_expiry VARCHAR(50),
-            dva_no VARCHAR(50),
-            dva_type VARCHAR(50),
-            concession_no VARCHAR(50),
-            concession_expiry VARCHAR(50),
-            health_fund VARCHAR(255),
-            health_fund_member_no VARCHAR(50),
-            ndis_no VARCHAR(50),
-            created_date TIMESTAMP,
-            consent_date TIMESTAMP,
-            privacy_policy_date TIMESTAMP,
-            client_id BIGINT UNIQUE,
-            gp_name VARCHAR(255),
-            db_created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            db_updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        
-        cursor.execute(create_table_query)
-        
-        # Create indexes for common queries
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_clients_client_id 
-            ON clients(client_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_clients_email 
-            ON clients(email)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_clients_surname 
-            ON clients(surname)
-        """)
-        
-        conn.commit()
-        logger.info(f"Clients table created successfully in database '{database_name}'")
-        
-        cursor.close()
-        conn.close()
-        return True
+        created = create_table(cursor, database_name)
+    except (psycopg2.errors.DuplicateTable, psycopg2.errors.UniqueViolation):
+        # A concurrent first import created it between IF NOT EXISTS and the
+        # catalog insert; the retry sees the committed table
+        conn.rollback()
+        created = create_table(cursor, database_name)
+    conn.commit()
+    mark_ready(database_name, table_name)
+    return created
+
+
+# Column mappings from Excel report headers to database columns (read-only,
+# built once); columns not listed are never stored, so they are skipped when
+# the workbook is read
+APPOINTMENTS_COLUMN_MAPPING = MappingProxyType({
+    'Appointment Date': 'appointment_date',
+    'Client': 'client',
+    'Appointment Type': 'appointment_type',
+    'Profession': 'profession',
+    'ClientDuration': 'client_duration',
+    'Practitioner': 'practitioner',
+    'Business': 'business',
+    'Appointment Status': 'appointment_status',
+    'Column #': 'column_number',
+    'Billed Status': 'billed_status',
+    'Clinical Note': 'clinical_note',
+    'Client ID': 'client_id',
+    'Appointment ID': 'appointment_id',
+    'Address 1': 'address_1',
+    'Address 2': 'address_2',
+    'Address 3': 'address_3',
+    'Address 4': 'address_4',
+    'Suburb': 'suburb',
+    'State': 'state',
+    'Postcode': 'postcode',
+    'Country': 'country'
+})
+
+CLIENTS_COLUMN_MAPPING = MappingProxyType({
+    'Title': 'title',
+    'First Name': 'first_name',
+    'Preferred Name': 'preferred_name',
+    'Middle': 'middle',
+    'Surname': 'surname',
+    'Date of Birth': 'date_of_birth',
+    'Address Line 1': 'address_line_1',
+    'Address Line 2': 'address_line_2',
+    'Address Line 3': 'address_line_3',
+    'Address Line 4': 'address_line_4',
+    'Country': 'country',
+    'State': 'state',
+    'Suburb': 'suburb',
+    'Postcode': 'postcode',
+    'Preferred Phone': 'preferred_phone',
+    'Work Phone': 'work_phone',
+    'Home Phone': 'home_phone',
+    'Mobile': 'mobile',
+    'Fax': 'fax',
+    'Email': 'email',
+    'File No': 'file_no',
+    'Gender': 'gender',
+    'Pronouns': 'pronouns',
+    'Sex': 'sex',
+    'Archived': 'archived',
+    'Notes': 'notes',
+    'Warnings': 'warnings',
+    'Fee Category': 'fee_category',
+    'Practitioner': 'practitioner',
+    'Medicare No': 'medicare_no',
+    'Medicare IRN': 'medicare_irn',
+    'Medicare Expiry': 'medicare_expiry',
+    'DVA No': 'dva_no',
+    'DVA Type': 'dva_type',
+    'Concession No': 'concession_no',
+    'Concession Expiry': 'concession_expiry',
+    'Health Fund': 'health_fund',
+    'Health Fund Member No': 'health_fund_member_no',
+    'NDIS No': 'ndis_no',
+    'Created Date': 'created_date',
+    'Consent Date': 'consent_date',
+    'Privacy Policy Date': 'privacy_policy_date',
+    'Client ID': 'client_id',
+    'GP Name': 'gp_name'
+})
+
+REPORT_COLUMN_MAPPINGS = MappingProxyType({
+    'appointments': APPOINTMENTS_COLUMN_MAPPING,
+    'clients': CLIENTS_COLUMN_MAPPING
+})
+
+
+def excel_cell_value(value):
+    """Normalize a calamine cell the way pandas' calamine reader does"""
+    if isinstance(value, float):
+        # Excel stores every number as a float; whole numbers come back as ints
+        as_int = int(value)
+        return as_int if as_int == value else value
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def read_excel_calamine(excel_bytes: bytes, column_mapping: dict = None) -> pd.DataFrame:
+    """
+    Read the first sheet with python-calamine, converting only the cells of mapped columns
+    Equivalent to pd.read_excel(engine='calamine', usecols=...), which converts
+    every cell of the sheet before discarding the unused columns
+    """
+    # BytesIO over an immutable bytes object shares its buffer (no copy is
+    # made unless the stream is written to)
+    sheet = CalamineWorkbook.from_filelike(io.BytesIO(excel_bytes)).get_sheet_by_index(0)
+    # Rows are converted one at a time, so only the header row is read before
+    # deciding whether the sheet is a report at all
+    rows = sheet.iter_rows()
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    
+    # iter_rows starts at the first used column; pad back to column A the way
+    # to_python(skip_empty_area=False), and so pd.read_excel, does
+    pad = [''] * sheet.start[1]
+    if pad:
+        header = pad + header
+        rows = (pad + row for row in rows)
+    keep = [i for i, name in enumerate(header) if column_mapping is None or name in column_mapping]
+    if not keep:
+        # Not the expected report layout: don't convert any further rows
+        logger.warning("No recognised report columns in Excel header")
+        return pd.DataFrame()
+    data = [[excel_cell_value(header[i]) for i in keep]]
+    data.extend([excel_cell_value(row[i]) for i in keep] for row in rows)
+    # Same parser (and so the same NA and type inference) pd.read_excel uses
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def read_excel_bytes(excel_bytes: bytes, table_name: str = None) -> pd.DataFrame:
+    """
+    Read an Excel workbook held in memory into a DataFrame
+    For a known report type only the columns in its mapping are read
+    """
+    column_mapping = REPORT_COLUMN_MAPPINGS.get(table_name)
+    if CalamineWorkbook is not None:
+        return read_excel_calamine(excel_bytes, column_mapping)
+    # A callable tolerates reports that lack some of the mapped headers
+    usecols = column_mapping.__contains__ if column_mapping else None
+    return pd.read_excel(io.BytesIO(excel_bytes), usecols=usecols)
+
+
+def evict_excel_cache():
+    """Delete least recently used cache entries until the cache fits its size limit"""
+    entries = [(f.stat(), f) for f in XLSX_CACHE_DIR.glob('*.pkl')]
+    total = sum(st.st_size for st, _ in entries)
+    for st, cache_file in sorted(entries, key=lambda entry: entry[0].st_mtime):
+        if total <= XLSX_CACHE_MAX_BYTES:
+            break
+        cache_file.unlink(missing_ok=True)
+        total -= st.st_size
+
+
+def read_excel_cached(excel_bytes: bytes, table_name: str = None) -> pd.DataFrame:
+    """
+    Read an Excel workbook, reusing the parsed DataFrame if the same bytes were seen before
+    Cache entries are pickles named by the SHA-256 of the workbook bytes and
+    the report type (which decides the columns read)
+    """
+    if XLSX_CACHE_MAX_BYTES <= 0:
+        return read_excel_bytes(excel_bytes, table_name)
+    
+    cache_key = hashlib.sha256(excel_bytes).hexdigest()
+    if table_name:
+        cache_key += f"-{table_name}"
+    cache_file = XLSX_CACHE_DIR / f"{cache_key}.pkl"
+    try:
+        df = pd.read_pickle(cache_file)
+        # Bump the mtime so eviction treats this entry as recently used
+        os.utime(cache_file)
+        logger.info(f"Using cached parse of Excel data: {cache_file.name}")
+        return df
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        logger.error(f"Error creating clients table: {e}")
-        return False
+        logger.warning(f"Ignoring unreadable Excel cache entry {cache_file.name}: {e}")
+    
+    df = read_excel_bytes(excel_bytes, table_name)
+    
+    try:
+        XLSX_CACHE_DIR.mkdir(exist_ok=True)
+        # Write then rename so other workers and threads never read a partial file
+        tmp_file = cache_file.with_suffix(f'.{os.getpid()}-{threading.get_ident()}.tmp')
+        df.to_pickle(tmp_file)
+        os.replace(tmp_file, cache_file)
+        evict_excel_cache()
+    except Exception as e:
+        logger.warning(f"Could not cache parsed Excel data: {e}")
+    
+    return df
 
 
-def parse_excel_from_base64(base64_data: str, filename: str):
-    """Parse Excel file from base64 encoded data"""
+def parse_excel_from_base64(base64_data: str, filename: str, table_name: str = None):
+    """Parse Excel file from base64 encoded data, reading only the columns table_name stores"""
     try:
-        # Check if file is actually an Excel file
-        if not filename.lower().endswith(('.xlsx', '.xls')):
-            logger.warning(f"Skipping non-Excel file: {filename}")
-            return None
-        
         # Decode base64 data
         excel_bytes = base64.b64decode(base64_data)
         
         # Read Excel file into pandas DataFrame
-        df = pd.read_excel(io.BytesIO(excel_bytes))
+        df = read_excel_cached(excel_bytes, table_name)
         
         logger.info(f"Successfully parsed Excel file '{filename}': {len(df)} rows, {len(df.columns)} columns")
         return df
@@ -315,148 +691,241 @@ def parse_excel_from_base64(base64_data: str, filename: str):
 
 def map_appointments_columns_to_db(df: pd.DataFrame):
     """Map Appointment Excel column names to database column names"""
-    # Column mapping from Excel to database
-    column_mapping = {
-        'Appointment Date': 'appointment_date',
-        'Client': 'client',
-        'Appointment Type': 'appointment_type',
-        'Profession': 'profession',
-        'ClientDuration': 'client_duration',
-        'Practitioner': 'practitioner',
-        'Business': 'business',
-        'Appointment Status': 'appointment_status',
-        'Column #': 'column_number',
-        'Billed Status': 'billed_status',
-        'Clinical Note': 'clinical_note',
-        'Client ID': 'client_id',
-        'Appointment ID': 'appointment_id',
-        'Address 1': 'address_1',
-        'Address 2': 'address_2',
-        'Address 3': 'address_3',
-        'Address 4': 'address_4',
-        'Suburb': 'suburb',
-        'State': 'state',
-        'Postcode': 'postcode',
-        'Country': 'country'
-    }
     
     # Rename columns
-    df_mapped = df.rename(columns=column_mapping)
+    df_mapped = df.rename(columns=APPOINTMENTS_COLUMN_MAPPING)
     
-    # Convert NaN to None for proper NULL handling in PostgreSQL
-    df_mapped = df_mapped.where(pd.notna(df_mapped), None)
+    # BIGINT columns: keep whole numbers as ints even when some cells are blank
+    for col in ('client_id', 'appointment_id'):
+        if col in df_mapped.columns:
+            df_mapped[col] = pd.to_numeric(df_mapped[col]).astype('Int64')
     
     return df_mapped
 
 
+def parse_date_value(value):
+    """Parse one date cell, returning None for blank or unparseable values"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    try:
+        dt = pd.to_datetime(value, errors='coerce')
+    except Exception:
+        return None
+    return dt.to_pydatetime() if pd.notna(dt) else None
+
+
+def parse_date_column(values: pd.Series) -> pd.Series:
+    """
+    Parse a column of dates in one call
+    format='mixed' parses each value on its own, like a per-value
+    pd.to_datetime, but raises for the whole column when values carry
+    different UTC offsets (or mix naive and aware ones); such columns are
+    parsed value by value instead
+    """
+    try:
+        return pd.to_datetime(values, errors='coerce', format='mixed')
+    except ValueError:
+        return values.map(parse_date_value).astype(object)
+
+
 def map_clients_columns_to_db(df: pd.DataFrame):
     """Map Client List Excel column names to database column names"""
-    # Column mapping from Excel to database
-    column_mapping = {
-        'Title': 'title',
-        'First Name': 'first_name',
-        'Preferred Name': 'preferred_name',
-        'Middle': 'middle',
-        'Surname': 'surname',
-        'Date of Birth': 'date_of_birth',
-        'Address Line 1': 'address_line_1',
-        'Address Line 2': 'address_line_2',
-        'Address Line 3': 'address_line_3',
-        'Address Line 4': 'address_line_4',
-        'Country': 'country',
-        'State': 'state',
-        'Suburb': 'suburb',
-        'Postcode': 'postcode',
-        'Preferred Phone': 'preferred_phone',
-        'Work Phone': 'work_phone',
-        'Home Phone': 'home_phone',
-        'Mobile': 'mobile',
-        'Fax': 'fax',
-        'Email': 'email',
-        'File No': 'file_no',
-        'Gender': 'gender',
-        'Pronouns': 'pronouns',
-        'Sex': 'sex',
-        'Archived': 'archived',
-        'Notes': 'notes',
-        'Warnings': 'warnings',
-        'Fee Category': 'fee_category',
-        'Practitioner': 'practitioner',
-        'Medicare No': 'medicare_no',
-        'Medicare IRN': 'medicare_irn',
-        'Medicare Expiry': 'medicare_expiry',
-        'DVA No': 'dva_no',
-        'DVA Type': 'dva_type',
-        'Concession No': 'concession_no',
-        'Concession Expiry': 'concession_expiry',
-        'Health Fund': 'health_fund',
-        'Health Fund Member No': 'health_fund_member_no',
-        'NDIS No': 'ndis_no',
-        'Created Date': 'created_date',
-        'Consent Date': 'consent_date',
-        'Privacy Policy Date': 'privacy_policy_date',
-        'Client ID': 'client_id',
-        'GP Name': 'gp_name'
-    }
     
     # Rename columns
-    df_mapped = df.rename(columns=column_mapping)
+    df_mapped = df.rename(columns=CLIENTS_COLUMN_MAPPING)
     
-    # Convert NaN to None for non-date columns first
-    df_mapped = df_mapped.where(pd.notna(df_mapped), None)
+    # BIGINT columns: keep whole numbers as ints even when some cells are blank
+    for col in ('file_no', 'client_id'):
+        if col in df_mapped.columns:
+            df_mapped[col] = pd.to_numeric(df_mapped[col]).astype('Int64')
     
-    # Handle date columns LAST - after all NaN conversions
+    # Parse date columns; unparseable values become NaT
     date_columns = ['created_date', 'consent_date', 'privacy_policy_date']
     for col in date_columns:
         if col in df_mapped.columns:
-            # Convert values to datetime, handling None values
-            converted_dates = []
-            for val in df_mapped[col]:
-                if val is None or (isinstance(val, float) and pd.isna(val)):
-                    # Already None or NaN - keep as None
-                    converted_dates.append(None)
-                else:
-                    # Try to convert to datetime
-                    try:
-                        dt = pd.to_datetime(val, errors='coerce')
-                        if pd.notna(dt):
-                            converted_dates.append(dt.to_pydatetime())
-                        else:
-                            converted_dates.append(None)
-                    except:
-                        converted_dates.append(None)
-            
-            df_mapped[col] = converted_dates
+            df_mapped[col] = parse_date_column(df_mapped[col])
     
     return df_mapped
 
 
-def clean_db_value(value):
-    """Normalize values before inserting into the database"""
-    if value is None:
-        return None
-    # Handle pandas NaT/NaN generically
-    try:
-        if pd.isna(value):
-            return None
-    except Exception:
-        pass
-    # Handle pandas NaT / NaN
-    if isinstance(value, float) and pd.isna(value):
-        return None
-    if isinstance(value, str) and value.strip().lower() == 'nat':
-        return None
-    if isinstance(value, pd.Timestamp):
-        return value.to_pydatetime()
-    return value
+def dataframe_to_rows(df: pd.DataFrame, db_columns: tuple) -> list:
+    """
+    Convert a mapped DataFrame into rows ordered like db_columns
+    Works on the whole frame at once: columns missing from the sheet become
+    NULL and every NaN/NaT/NA becomes None for proper NULL handling
+    """
+    # Fill one object array column by column (missing columns stay None)
+    # instead of materializing a reindexed frame first; dtype=object yields
+    # plain Python scalars (int, float, str, Timestamp), all of which psycopg2
+    # adapts directly
+    values = np.empty((len(df), len(db_columns)), dtype=object)
+    for i, col in enumerate(db_columns):
+        if col in df.columns:
+            values[:, i] = df[col].to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    # Row lists work anywhere tuples do for execute_values and COPY
+    return values.tolist()
+
+
+class CopyNull(float):
+    """
+    Stand-in for None in COPY CSV data: written as an unquoted empty field,
+    which COPY reads as NULL. It counts as numeric, so QUOTE_NONNUMERIC
+    leaves it unquoted while quoting every string; a quoted value (even ""
+    or "\\N") is never taken for NULL
+    """
+    
+    def __repr__(self):
+        return ''
+    
+    __str__ = __repr__
+
+
+COPY_NULL = CopyNull()
+
+
+def copy_upsert(cursor, table_name: str, db_columns: tuple, rows: list, conflict_sql: str):
+    """
+    Upsert a large batch by COPYing it into a temporary staging table and
+    merging with a single INSERT ... SELECT ... ON CONFLICT statement
+    COPY streams the rows in one protocol exchange instead of one
+    multi-row INSERT per page
+    """
+    columns_str = ', '.join(db_columns)
+    staging_table = f"tmp_{table_name}"
+    
+    # Same column types as the target, without its constraints or defaults
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS
+        SELECT {columns_str} FROM {table_name} WITH NO DATA
+    """)
+    
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n').writerows(
+        [COPY_NULL if value is None else value for value in row] for row in rows
+    )
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY {staging_table} ({columns_str}) FROM STDIN WITH (FORMAT csv)",
+        buf
+    )
+    
+    cursor.execute(f"""
+        INSERT INTO {table_name} ({columns_str})
+        SELECT {columns_str} FROM {staging_table}
+        {conflict_sql}
+    """)
+
+
+# Non-unique indexes (name, column) that bulk loads may drop and rebuild; the
+# UNIQUE constraint indexes stay, ON CONFLICT needs them
+BULK_LOAD_INDEXES = {
+    'appointments': [
+        ('idx_appointments_date', 'appointment_date'),
+        ('idx_appointments_client_id', 'client_id'),
+        ('idx_appointments_appointment_id', 'appointment_id')
+    ],
+    'clients': [
+        ('idx_clients_client_id', 'client_id'),
+        ('idx_clients_email', 'email'),
+        ('idx_clients_surname', 'surname')
+    ]
+}
+
+
+@contextmanager
+def secondary_indexes_deferred(cursor, table_name: str, row_count: int):
+    """
+    For a large batch, drop the table's secondary indexes before the upsert and
+    rebuild them after it, in the caller's transaction
+    Building an index once is cheaper than maintaining it row by row, but a
+    rebuild reads the whole table, so this only pays off when the batch is a
+    large share of it. DROP INDEX locks the table until commit; if the upsert
+    fails the rollback restores the indexes
+    """
+    indexes = BULK_LOAD_INDEXES.get(table_name)
+    defer = False
+    if indexes and row_count >= BULK_LOAD_MIN_ROWS:
+        # Planner estimate; -1 (never analyzed) or 0 for new tables
+        cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", (table_name,))
+        defer = row_count >= cursor.fetchone()[0] / 2
+    
+    if not defer:
+        yield
+        return
+    
+    logger.info(f"Bulk loading {row_count} rows into {table_name} with secondary indexes dropped")
+    cursor.execute(f"DROP INDEX IF EXISTS {', '.join(name for name, _ in indexes)}")
+    yield
+    cursor.execute('; '.join(f"CREATE INDEX {name} ON {table_name}({column})" for name, column in indexes))
+
+
+def values_upsert(cursor, upsert_sql: str, template: str, rows: list) -> int:
+    """
+    Run an INSERT ... VALUES %s upsert in pages of UPSERT_PAGE_SIZE rows
+    Returns the total rows affected (cursor.rowcount after execute_values
+    only covers its last page)
+    """
+    rows_affected = 0
+    for start in range(0, len(rows), UPSERT_PAGE_SIZE):
+        page = rows[start:start + UPSERT_PAGE_SIZE]
+        execute_values(cursor, upsert_sql, page, template=template, page_size=len(page))
+        rows_affected += cursor.rowcount
+    return rows_affected
+
+
+def upsert_conflict_sql(db_columns: tuple, key_column: str, updated_at_column: str) -> str:
+    """ON CONFLICT clause updating every column but the key, and bumping the update timestamp"""
+    update_str = ', '.join([f"{col} = EXCLUDED.{col}" for col in db_columns if col != key_column])
+    return f"""
+        ON CONFLICT ({key_column}) 
+        DO UPDATE SET 
+            {update_str},
+            {updated_at_column} = CURRENT_TIMESTAMP
+        """
+
+
+# Upsert columns (immutable) and statements, built once at import
+# Appointments: excluding id, created_at, updated_at which are auto-generated
+APPOINTMENTS_DB_COLUMNS = (
+    'appointment_date', 'client', 'appointment_type', 'profession',
+    'client_duration', 'practitioner', 'business', 'appointment_status',
+    'column_number', 'billed_status', 'clinical_note', 'client_id',
+    'appointment_id', 'address_1', 'address_2', 'address_3', 'address_4',
+    'suburb', 'state', 'postcode', 'country'
+)
+APPOINTMENTS_VALUES_TEMPLATE = '(' + ', '.join(['%s'] * len(APPOINTMENTS_DB_COLUMNS)) + ')'
+APPOINTMENTS_CONFLICT_SQL = upsert_conflict_sql(APPOINTMENTS_DB_COLUMNS, 'appointment_id', 'updated_at')
+APPOINTMENTS_UPSERT_SQL = f"""
+        INSERT INTO appointments ({', '.join(APPOINTMENTS_DB_COLUMNS)})
+        VALUES %s
+        {APPOINTMENTS_CONFLICT_SQL}
+        """
+
+# Clients: excluding id, db_created_at, db_updated_at which are auto-generated
+CLIENTS_DB_COLUMNS = (
+    'title', 'first_name', 'preferred_name', 'middle', 'surname', 'date_of_birth',
+    'address_line_1', 'address_line_2', 'address_line_3', 'address_line_4',
+    'country', 'state', 'suburb', 'postcode', 'preferred_phone', 'work_phone',
+    'home_phone', 'mobile', 'fax', 'email', 'file_no', 'gender', 'pronouns',
+    'sex', 'archived', 'notes', 'warnings', 'fee_category', 'practitioner',
+    'medicare_no', 'medicare_irn', 'medicare_expiry', 'dva_no', 'dva_type',
+    'concession_no', 'concession_expiry', 'health_fund', 'health_fund_member_no',
+    'ndis_no', 'created_date', 'consent_date', 'privacy_policy_date', 'client_id',
+    'gp_name'
+)
+CLIENTS_VALUES_TEMPLATE = '(' + ', '.join(['%s'] * len(CLIENTS_DB_COLUMNS)) + ')'
+CLIENTS_CONFLICT_SQL = upsert_conflict_sql(CLIENTS_DB_COLUMNS, 'client_id', 'db_updated_at')
+CLIENTS_UPSERT_SQL = f"""
+        INSERT INTO clients ({', '.join(CLIENTS_DB_COLUMNS)})
+        VALUES %s
+        {CLIENTS_CONFLICT_SQL}
+        """
 
 
 def insert_appointments_data(database_name: str, df: pd.DataFrame):
     """Insert appointment data into the database with upsert to avoid duplicates"""
     try:
-        conn = get_db_connection(database_name)
-        cursor = conn.cursor()
-        
         # Map columns
         df_mapped = map_appointments_columns_to_db(df)
         
@@ -466,50 +935,27 @@ def insert_appointments_data(database_name: str, df: pd.DataFrame):
             df_mapped = df_mapped.drop_duplicates(subset=['appointment_id'], keep='last')
             logger.info(f"After deduplication: {len(df_mapped)} unique appointments")
         
-        # Prepare columns list (excluding id, created_at, updated_at which are auto-generated)
-        db_columns = [
-            'appointment_date', 'client', 'appointment_type', 'profession',
-            'client_duration', 'practitioner', 'business', 'appointment_status',
-            'column_number', 'billed_status', 'clinical_note', 'client_id',
-            'appointment_id', 'address_1', 'address_2', 'address_3', 'address_4',
-            'suburb', 'state', 'postcode', 'country'
-        ]
-        
         # Prepare data tuples
-        data_tuples = []
-        for _, row in df_mapped.iterrows():
-            row_data = tuple(clean_db_value(row[col]) if col in row else None for col in db_columns)
-            data_tuples.append(row_data)
-        
-        # Prepare INSERT ... ON CONFLICT (UPSERT) query
-        # This will insert new records or update existing ones based on appointment_id
-        columns_str = ', '.join(db_columns)
-        placeholders = ', '.join(['%s'] * len(db_columns))
-        
-        # Build update columns for ON CONFLICT (excluding appointment_id which is the conflict target)
-        update_columns = [col for col in db_columns if col != 'appointment_id']
-        update_str = ', '.join([f"{col} = EXCLUDED.{col}" for col in update_columns])
-        
-        upsert_query = f"""
-        INSERT INTO appointments ({columns_str})
-        VALUES %s
-        ON CONFLICT (appointment_id) 
-        DO UPDATE SET 
-            {update_str},
-            updated_at = CURRENT_TIMESTAMP
-        """
-        
-        # Execute batch insert with execute_values for better performance
-        execute_values(cursor, upsert_query, data_tuples)
+        data_tuples = dataframe_to_rows(df_mapped, APPOINTMENTS_DB_COLUMNS)
         
-        conn.commit()
+        with db_conn(database_name) as (conn, cursor):
+            # First use only: create the table before the (longer) upsert transaction
+            table_created = ensure_report_table(conn, cursor, create_appointments_table, database_name, 'appointments')
+            with secondary_indexes_deferred(cursor, 'appointments', len(data_tuples)):
+                if len(data_tuples) >= COPY_UPSERT_MIN_ROWS:
+                    # Large reports: COPY into a staging table, then one merge statement
+                    copy_upsert(cursor, 'appointments', APPOINTMENTS_DB_COLUMNS, data_tuples, APPOINTMENTS_CONFLICT_SQL)
+                    rows_affected = cursor.rowcount
+                else:
+                    # Execute batch insert with execute_values for better performance
+                    rows_affected = values_upsert(cursor, APPOINTMENTS_UPSERT_SQL, APPOINTMENTS_VALUES_TEMPLATE, data_tuples)
+
+            conn.commit()
         
-        rows_affected = cursor.rowcount
+        if table_created:
+            logger.info(f"Appointments table created successfully in database '{database_name}'")
         logger.info(f"Successfully inserted/updated {rows_affected} appointments in database '{database_name}'")
         
-        cursor.close()
-        conn.close()
-        
         return {
             'success': True,
             'rows_processed': len(data_tuples),
@@ -518,6 +964,9 @@ def insert_appointments_data(database_name: str, df: pd.DataFrame):
         
     except Exception as e:
         logger.error(f"Error inserting appointments data: {e}", exc_info=True)
+        if isinstance(e, psycopg2.Error):
+            # The database or table may have been dropped underneath us
+            forget_ready(database_name)
         return {
             'success': False,
             'error': str(e)
@@ -527,9 +976,6 @@ def insert_appointments_data(database_name: str, df: pd.DataFrame):
 def insert_clients_data(database_name: str, df: pd.DataFrame):
     """Insert client data into the database with upsert to avoid duplicates"""
     try:
-        conn = get_db_connection(database_name)
-        cursor = conn.cursor()
-        
         # Map columns
         df_mapped = map_clients_columns_to_db(df)
         
@@ -539,53 +985,27 @@ def insert_clients_data(database_name: str, df: pd.DataFrame):
             df_mapped = df_mapped.drop_duplicates(subset=['client_id'], keep='last')
             logger.info(f"After deduplication: {len(df_mapped)} unique clients")
         
-        # Prepare columns list (excluding id, db_created_at, db_updated_at which are auto-generated)
-        db_columns = [
-            'title', 'first_name', 'preferred_name', 'middle', 'surname', 'date_of_birth',
-            'address_line_1', 'address_line_2', 'address_line_3', 'address_line_4',
-            'country', 'state', 'suburb', 'postcode', 'preferred_phone', 'work_phone',
-            'home_phone', 'mobile', 'fax', 'email', 'file_no', 'gender', 'pronouns',
-            'sex', 'archived', 'notes', 'warnings', 'fee_category', 'practitioner',
-            'medicare_no', 'medicare_irn', 'medicare_expiry', 'dva_no', 'dva_type',
-            'concession_no', 'concession_expiry', 'health_fund', 'health_fund_member_no',
-            'ndis_no', 'created_date', 'consent_date', 'privacy_policy_date', 'client_id',
-            'gp_name'
-        ]
-        
         # Prepare data tuples
-        data_tuples = []
-        for _, row in df_mapped.iterrows():
-            row_data = tuple(clean_db_value(row[col]) if col in row else None for col in db_columns)
-            data_tuples.append(row_data)
-        
-        # Prepare INSERT ... ON CONFLICT (UPSERT) query
-        # This will insert new records or update existing ones based on client_id
-        columns_str = ', '.join(db_columns)
-        
-        # Build update columns for ON CONFLICT (excluding client_id which is the conflict target)
-        update_columns = [col for col in db_columns if col != 'client_id']
-        update_str = ', '.join([f"{col} = EXCLUDED.{col}" for col in update_columns])
+        data_tuples = dataframe_to_rows(df_mapped, CLIENTS_DB_COLUMNS)
         
-        upsert_query = f"""
-        INSERT INTO clients ({columns_str})
-        VALUES %s
-        ON CONFLICT (client_id) 
-        DO UPDATE SET 
-            {update_str},
-            db_updated_at = CURRENT_TIMESTAMP
-        """
-        
-        # Execute batch insert with execute_values for better performance
-        execute_values(cursor, upsert_query, data_tuples)
-        
-        conn.commit()
+        with db_conn(database_name) as (conn, cursor):
+            # First use only: create the table before the (longer) upsert transaction
+            table_created = ensure_report_table(conn, cursor, create_clients_table, database_name, 'clients')
+            with secondary_indexes_deferred(cursor, 'clients', len(data_tuples)):
+                if len(data_tuples) >= COPY_UPSERT_MIN_ROWS:
+                    # Large reports: COPY into a staging table, then one merge statement
+                    copy_upsert(cursor, 'clients', CLIENTS_DB_COLUMNS, data_tuples, CLIENTS_CONFLICT_SQL)
+                    rows_affected = cursor.rowcount
+                else:
+                    # Execute batch insert with execute_values for better performance
+                    rows_affected = values_upsert(cursor, CLIENTS_UPSERT_SQL, CLIENTS_VALUES_TEMPLATE, data_tuples)
+
+            conn.commit()
         
-        rows_affected = cursor.rowcount
+        if table_created:
+            logger.info(f"Clients table created successfully in database '{database_name}'")
         logger.info(f"Successfully inserted/updated {rows_affected} clients in database '{database_name}'")
         
-        cursor.close()
-        conn.close()
-        
         return {
             'success': True,
             'rows_processed': len(data_tuples),
@@ -594,15 +1014,107 @@ def insert_clients_data(database_name: str, df: pd.DataFrame):
         
     except Exception as e:
         logger.error(f"Error inserting clients data: {e}", exc_info=True)
+        if isinstance(e, psycopg2.Error):
+            # The database or table may have been dropped underneath us
+            forget_ready(database_name)
         return {
             'success': False,
             'error': str(e)
         }
 
 
-def process_attachment_and_store(email_data: dict):
+# Report tables and the function upserting a parsed report into each (creating
+# the table on first use)
+REPORT_TABLES = {
+    'appointments': insert_appointments_data,
+    'clients': insert_clients_data
+}
+
+
+def process_single_attachment(clinic_name: str, attachment: dict) -> dict:
+    """Parse one attachment and upsert it into the clinic's database"""
+    filename = attachment.get('name', '')
+    table_name = extract_table_name(filename)
+    
+    logger.info(f"Processing attachment: {filename} -> table: {table_name}")
+    
+    # Skip other files
+    if table_name not in REPORT_TABLES:
+        logger.info(f"Skipping unsupported file: {filename}")
+        return {
+            "filename": filename,
+            "table": table_name,
+            "status": "skipped",
+            "reason": "File type not supported (only Appointment and Client List reports)"
+        }
+    
+    # Check if file is actually an Excel file before decoding it
+    if not filename.lower().endswith(('.xlsx', '.xls')):
+        logger.warning(f"Skipping non-Excel file: {filename}")
+        return {
+            "filename": filename,
+            "table": table_name,
+            "database": clinic_name,
+            "status": "skipped",
+            "reason": "Not an Excel attachment"
+        }
+    
+    insert_data = REPORT_TABLES[table_name]
+    
+    # Check if attachment has data
+    attachment_data = attachment.get('data', '')
+    if not attachment_data:
+        logger.warning(f"No data found in attachment: {filename}")
+        return {
+            "filename": filename,
+            "table": table_name,
+            "database": clinic_name,
+            "status": "warning",
+            "message": "No attachment data found"
+        }
+    
+    # Parse Excel file
+    df = parse_excel_from_base64(attachment_data, filename, table_name)
+    if df is None or df.empty:
+        return {
+            "filename": filename,
+            "table": table_name,
+            "database": clinic_name,
+            "status": "error",
+            "message": "Failed to parse Excel file or file is empty"
+        }
+    
+    # Insert data into database
+    insert_result = insert_data(clinic_name, df)
+    
+    if insert_result['success']:
+        logger.info(f"Successfully imported {insert_result['rows_affected']} rows from {filename}")
+        return {
+            "filename": filename,
+            "table": table_name,
+            "database": clinic_name,
+            "status": "success",
+            "rows_processed": insert_result['rows_processed'],
+            "rows_affected": insert_result['rows_affected']
+        }
+    return {
+        "filename": filename,
+        "table": table_name,
+        "database": clinic_name,
+        "status": "error",
+        "message": insert_result.get('error', 'Unknown error')
+    }
+
+
+def process_attachment_group(clinic_name: str, group: list) -> list:
+    """Process (index, attachment) pairs one after another, keeping their indexes"""
+    return [(index, process_single_attachment(clinic_name, attachment)) for index, attachment in group]
+
+
+async def process_attachment_and_store(email_data: dict):
     """
     Process email attachments and store data in appropriate database
+    Blocking work (parsing, database calls) runs on attachment_executor threads
     """
     try:
         # Extract clinic name from 'to' field
@@ -615,8 +1127,10 @@ def process_attachment_and_store(email_data: dict):
         
         logger.info(f"Processing email for clinic: {clinic_name}")
         
+        loop = asyncio.get_running_loop()
+        
         # Create database for clinic
-        if not create_database(clinic_name):
+        if not await loop.run_in_executor(attachment_executor, create_database, clinic_name):
             return {"status": "error", "message": "Failed to create database"}
         
         # Process attachments
@@ -625,142 +1139,22 @@ def process_attachment_and_store(email_data: dict):
             logger.info("No attachments found in email")
             return {"status": "warning", "message": "No attachments to process"}
         
-        results = []
-        for attachment in attachments:
-            filename = attachment.get('name', '')
-            table_name = extract_table_name(filename)
-            
-            logger.info(f"Processing attachment: {filename} -> table: {table_name}")
-            
-            # Process Appointments
-            if table_name == 'appointments':
-                # Create the appointments table
-                if not create_appointments_table(clinic_name):
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "error",
-                        "message": "Failed to create table"
-                    })
-                    continue
-                
-                # Check if attachment has data
-                attachment_data = attachment.get('data', '')
-                if not attachment_data:
-                    logger.warning(f"No data found in attachment: {filename}")
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "warning",
-                        "message": "No attachment data found"
-                    })
-                    continue
-                
-                # Parse Excel file
-                df = parse_excel_from_base64(attachment_data, filename)
-                if df is None or df.empty:
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "error",
-                        "message": "Failed to parse Excel file or file is empty"
-                    })
-                    continue
-                
-                # Insert data into database
-                insert_result = insert_appointments_data(clinic_name, df)
-                
-                if insert_result['success']:
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "success",
-                        "rows_processed": insert_result['rows_processed'],
-                        "rows_affected": insert_result['rows_affected']
-                    })
-                    logger.info(f"Successfully imported {insert_result['rows_affected']} rows from {filename}")
-                else:
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "error",
-                        "message": insert_result.get('error', 'Unknown error')
-                    })
-            
-            # Process Clients
-            elif table_name == 'clients':
-                # Create the clients table
-                if not create_clients_table(clinic_name):
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "error",
-                        "message": "Failed to create table"
-                    })
-                    continue
-                
-                # Check if attachment has data
-                attachment_data = attachment.get('data', '')
-                if not attachment_data:
-                    logger.warning(f"No data found in attachment: {filename}")
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "warning",
-                        "message": "No attachment data found"
-                    })
-                    continue
-                
-                # Parse Excel file
-                df = parse_excel_from_base64(attachment_data, filename)
-                if df is None or df.empty:
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "error",
-                        "message": "Failed to parse Excel file or file is empty"
-                    })
-                    continue
-                
-                # Insert data into database
-                insert_result = insert_clients_data(clinic_name, df)
-                
-                if insert_result['success']:
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "success",
-                        "rows_processed": insert_result['rows_processed'],
-                        "rows_affected": insert_result['rows_affected']
-                    })
-                    logger.info(f"Successfully imported {insert_result['rows_affected']} rows from {filename}")
-                else:
-                    results.append({
-                        "filename": filename,
-                        "table": table_name,
-                        "database": clinic_name,
-                        "status": "error",
-                        "message": insert_result.get('error', 'Unknown error')
-                    })
-            
-            # Skip other files
-            else:
-                logger.info(f"Skipping unsupported file: {filename}")
-                results.append({
-                    "filename": filename,
-                    "table": table_name,
-                    "status": "skipped",
-                    "reason": "File type not supported (only Appointment and Client List reports)"
-                })
+        # Attachments for different tables are independent and run in parallel;
+        # ones for the same table run in order so their upserts don't contend
+        groups = {}
+        for index, attachment in enumerate(attachments):
+            table_name = extract_table_name(attachment.get('name', ''))
+            groups.setdefault(table_name, []).append((index, attachment))
+        
+        group_results = await asyncio.gather(*[
+            loop.run_in_executor(attachment_executor, process_attachment_group, clinic_name, group)
+            for group in groups.values()
+        ])
+        
+        results = [None] * len(attachments)
+        for group_result in group_results:
+            for index, result in group_result:
+                results[index] = result
         
         return {
             "status": "success",
@@ -773,7 +1167,198 @@ def process_attachment_and_store(email_data: dict):
         return {"status": "error", "message": str(e)}
 
 
-app = FastAPI(title="Email Forwarding Logger", version="1.0.0")
+class TokenBucket:
+    """Simple token bucket: allows `rate` events per second with bursts up to `rate`"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+# Formatting a traceback is O(stack depth); cap it so a flood of bad requests
+# cannot turn error logging into the bottleneck
+error_traceback_budget = TokenBucket(ERROR_TRACEBACKS_PER_SECOND)
+
+
+class LazyJson:
+    """Defers JSON serialization until a log handler actually formats the record"""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return orjson.dumps(self.obj, option=orjson.OPT_INDENT_2, default=str).decode()
+
+
+def email_without_attachment_data(email_data):
+    """
+    Shallow copy of an email for logging, with each attachment's base64 data
+    replaced by its length
+    """
+    if not isinstance(email_data, dict) or not isinstance(email_data.get('attachments'), list):
+        return email_data
+    attachments = [
+        {**{k: v for k, v in att.items() if k != 'data'},
+         'data_len': len(att['data']) if isinstance(att.get('data'), str) else 0}
+        if isinstance(att, dict) else att
+        for att in email_data['attachments']
+    ]
+    return {**email_data, 'attachments': attachments}
+
+
+def format_email_summary(email_data, json_file: Path, payload_size: int) -> str:
+    """Build the multi-line log entry describing a received email"""
+    banner = "=" * 80
+    lines = [banner, "NEW EMAIL RECEIVED", banner]
+    
+    # Log specific fields if they exist
+    if isinstance(email_data, dict):
+        lines.append(f"From: {email_data.get('from', 'N/A')}")
+        lines.append(f"To: {email_data.get('to', 'N/A')}")
+        lines.append(f"Subject: {email_data.get('subject', 'N/A')}")
+        lines.append(f"Date: {email_data.get('date', 'N/A')}")
+        
+        attachments = email_data.get('attachments')
+        if attachments is not None:
+            lines.append(f"Attachments: {len(attachments)}")
+            for idx, att in enumerate(attachments, 1):
+                lines.append(f"  Attachment {idx}: {att.get('name', 'N/A')} ({att.get('size', 'N/A')} bytes)")
+    
+    lines.append(banner)
+    lines.append(f"Email data queued for: {json_file} ({payload_size} bytes)")
+    return "\n".join(lines)
+
+
+class EmailLog:
+    """
+    Append-only JSONL log of received emails, one file per day
+    The current file descriptor is kept open so each batch costs a single
+    write syscall instead of a mkdir + open + write + close per email
+    """
+
+    # O_APPEND makes each write land atomically at the end of the file, so
+    # several worker processes can share it; O_BINARY only exists on Windows
+    OPEN_FLAGS = (
+        os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0)
+    )
+
+    # Most buffers a single writev call accepts
+    IOV_MAX = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') else 1024
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.path = None
+        self.fd = None
+        self.day = None
+        self.day_path = None
+
+    def path_for(self, when: datetime) -> Path:
+        """Path of the JSONL file that emails received at `when` go to"""
+        # Only build a new path when the date changes; integer formatting
+        # instead of strftime for the rare rebuild
+        day = (when.year, when.month, when.day)
+        if day != self.day:
+            self.day_path = self.directory / f"emails_{when.year:04d}{when.month:02d}{when.day:02d}.jsonl"
+            self.day = day
+        return self.day_path
+
+    def open(self, path: Path):
+        """Switch to `path`, closing the previous day's file"""
+        self.close()
+        path.parent.mkdir(exist_ok=True)
+        self.fd = os.open(path, self.OPEN_FLAGS, 0o644)
+        self.path = path
+
+    def write(self, data: bytes):
+        """Write raw bytes straight to the descriptor, no Python buffering"""
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def write_lines(self, lines: list):
+        """Write the buffers with writev (one syscall per IOV_MAX lines) instead of joining them"""
+        if not hasattr(os, 'writev'):
+            # Windows has no writev
+            self.write(b''.join(lines))
+            return
+        for start in range(0, len(lines), self.IOV_MAX):
+            chunk = lines[start:start + self.IOV_MAX]
+            written = os.writev(self.fd, chunk)
+            if written < sum(map(len, chunk)):
+                # Short write: finish the remainder the slow way
+                self.write(b''.join(chunk)[written:])
+
+    def append(self, batch: list):
+        """Append a batch of (path, line) pairs (called from a worker thread)"""
+        for path, entries in groupby(batch, key=lambda entry: entry[0]):
+            if path != self.path:
+                self.open(path)
+            self.write_lines([line for _, line in entries])
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.path = None
+
+
+async def email_writer(queue: asyncio.Queue, email_log: EmailLog):
+    """
+    Background task that persists queued emails
+    Takes whatever has accumulated (up to EMAIL_WRITE_BATCH_SIZE) and
+    appends it in a single worker-thread call, so bursts of webhooks share
+    one thread hop instead of paying for one each
+    """
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < EMAIL_WRITE_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        
+        try:
+            await asyncio.to_thread(email_log.append, batch)
+        except Exception as e:
+            logger.error(f"Error saving {len(batch)} email(s) to disk: {e}", exc_info=True)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the email writer on startup and flush pending emails on shutdown"""
+    app.state.email_log = EmailLog(EMAILS_DIR)
+    app.state.email_log.open(app.state.email_log.path_for(datetime.now()))
+    app.state.email_queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+    writer_task = asyncio.create_task(email_writer(app.state.email_queue, app.state.email_log))
+    
+    yield
+    
+    await app.state.email_queue.join()
+    writer_task.cancel()
+    app.state.email_log.close()
+
+
+app = FastAPI(
+    title="Email Forwarding Logger",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+# Compress larger JSON replies; level 4 is nearly as small as the default 6 on
+# compact orjson output for noticeably less CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
 
 
 @app.get("/")
@@ -781,6 +1366,46 @@ async def root():
     return {"message": "Email Logger API is running", "status": "active"}
 
 
+async def read_body(request: Request) -> memoryview:
+    """
+    Read the request body into a single buffer sized from Content-Length
+    Avoids accumulating chunks and joining them into a second copy; the
+    result is a view that can be handed straight to orjson.loads
+    """
+    try:
+        expected = int(request.headers.get("content-length", 0))
+    except ValueError:
+        expected = 0
+    
+    buf = bytearray(min(max(expected, 0), MAX_BODY_PREALLOCATION))
+    filled = 0
+    async for chunk in request.stream():
+        # Fills the preallocated space in place, growing only past the end
+        buf[filled:filled + len(chunk)] = chunk
+        filled += len(chunk)
+    
+    return memoryview(buf)[:filled]
+
+
+# Everything in the non-JSON response except the timestamp is constant, so
+# the body is assembled from pre-encoded pieces instead of serializing a dict
+NON_JSON_RESPONSE_PREFIX = b'{"status":"warning","message":"Received non-JSON data","timestamp":"'
+NON_JSON_RESPONSE_SUFFIX = b'"}'
+
+
+def non_json_response(timestamp: str):
+    """Response for request bodies that are not JSON"""
+    # Log a warning without the body content
+    logger.warning("Received non-JSON data (body not logged for privacy)")
+    
+    # ISO timestamps are plain ASCII and need no JSON escaping
+    return Response(
+        status_code=200,
+        content=NON_JSON_RESPONSE_PREFIX + timestamp.encode() + NON_JSON_RESPONSE_SUFFIX,
+        media_type="application/json"
+    )
+
+
 @app.post("/webhook/email")
 async def receive_email(request: Request):
     """
@@ -788,69 +1413,62 @@ async def receive_email(request: Request):
     Logs email metadata and processes attachments
     """
     try:
+        # Read the clock once; every timestamp in this request derives from it
+        received_at = datetime.now()
+        received_iso = received_at.isoformat()
+        
         # Get the raw body
-        body = await request.body()
+        body = await read_body(request)
+        
+        # Check the declared type first so non-JSON bodies skip the parser
+        if "json" not in request.headers.get("content-type", "").lower():
+            return non_json_response(received_iso)
         
-        # Try to parse as JSON
+        # Parse exactly once, straight off the raw bytes
         try:
-            email_data = await request.json()
-            logger.info("=" * 80)
-            logger.info("NEW EMAIL RECEIVED")
-            logger.info("=" * 80)
-            
-            # Log specific fields if they exist
-            if isinstance(email_data, dict):
-                logger.info(f"From: {email_data.get('from', 'N/A')}")
-                logger.info(f"To: {email_data.get('to', 'N/A')}")
-                logger.info(f"Subject: {email_data.get('subject', 'N/A')}")
-                logger.info(f"Date: {email_data.get('date', 'N/A')}")
-                
-                if 'attachments' in email_data:
-                    logger.info(f"Attachments: {len(email_data.get('attachments', []))}")
-                    for idx, att in enumerate(email_data.get('attachments', [])):
-                        logger.info(f"  Attachment {idx + 1}: {att.get('name', 'N/A')} ({att.get('size', 'N/A')} bytes)")
-            
-            logger.info("=" * 80)
-            
-            # Also save to a JSON file for inspection
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            json_file = Path(f"emails/email_{timestamp}.json")
-            json_file.parent.mkdir(exist_ok=True)
-            
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(email_data, f, indent=2, default=str)
-            
-            logger.info(f"Email data saved to: {json_file}")
-            
-            # Process attachments and create database/tables
-            db_result = process_attachment_and_store(email_data)
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "status": "success",
-                    "message": "Email logged successfully",
-                    "timestamp": datetime.now().isoformat(),
-                    "saved_to": str(json_file),
-                    "database_result": db_result
-                }
-            )
-            
-        except json.JSONDecodeError:
-            # If not JSON, log a warning without the body content
-            logger.warning("Received non-JSON data (body not logged for privacy)")
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "status": "warning",
-                    "message": "Received non-JSON data",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
-            
+            email_data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return non_json_response(received_iso)
+        
+        # Also append to the daily JSONL log for inspection
+        json_file = request.app.state.email_log.path_for(received_at)
+        
+        # Serialize once and reuse the bytes for the file and the log line
+        logged_email = email_data if EMAIL_LOG_ATTACHMENT_DATA else email_without_attachment_data(email_data)
+        payload = orjson.dumps(
+            {"received_at": received_iso, "email": logged_email},
+            option=orjson.OPT_APPEND_NEWLINE,
+            default=str
+        )
+        
+        # Hand off to the background writer; disk I/O stays off the request path
+        await request.app.state.email_queue.put((json_file, payload))
+        
+        # One log record per email instead of one per line
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(format_email_summary(email_data, json_file, len(payload)))
+        # The full structure is DEBUG-only and only serialized if a handler
+        # formats the record, so the default INFO level pays nothing for it;
+        # attachment payloads are logged by size only
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Complete email structure: %s", LazyJson(email_without_attachment_data(email_data)))
+        
+        # Process attachments and create database/tables
+        db_result = await process_attachment_and_store(email_data)
+        
+        return ORJSONResponse(
+            status_code=200,
+            content={
+                "status": "success",
+                "message": "Email logged successfully",
+                "timestamp": received_iso,
+                "saved_to": str(json_file),
+                "database_result": db_result
+            }
+        )
+        
     except Exception as e:
-        logger.error(f"Error processing email: {str(e)}", exc_info=True)
+        logger.error(f"Error processing email: {str(e)}", exc_info=error_traceback_budget.allow())
         raise HTTPException(status_code=500, detail=f"Error processing email: {str(e)}")
 
 
@@ -861,5 +1479,27 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # One worker process per core by default, up to 4 (same env var the uvicorn
+    # CLI reads). Each worker runs its own lifespan, so it opens its own
+    # O_APPEND handle on the JSONL log and appends never interleave.
+    # Connection budget: each worker keeps up to DB_POOL_MAX_POOLS x
+    # DB_POOL_MIN_CONN idle connections (4 by default) and opens at most one
+    # per attachment thread while busy, so WEB_CONCURRENCY x (DB_POOL_MAX_POOLS
+    # x DB_POOL_MIN_CONN + ATTACHMENT_WORKERS) must stay under the server's
+    # max_connections (100 by default). With the defaults that is about 14 per
+    # worker, hence the cap: os.cpu_count() reports the host's cores, not a
+    # container's CPU limit
+    workers = int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 2, 4)))
+    # uvicorn[standard] ships uvloop and httptools; use them explicitly so the
+    # request read path and HTTP parsing run in C (uvloop has no Windows build)
+    uvicorn.run(
+        # Multiple workers need an import string; a single worker reuses this
+        # module instead of importing it (and configuring logging) a second time
+        "main:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
 
@@ -2,12 +2,24 @@
 Script to read data from PostgreSQL clinic databases
 Demonstrates various queries and data retrieval methods
 """
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+import hashlib
 import os
+import select
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import datetime
 import json
+import orjson
 
 # Load environment variables
 load_dotenv()
@@ -21,9 +33,73 @@ DB_CONFIG = {
     'admin_db': os.getenv('POSTGRES_ADMIN_DB', 'postgres')
 }
 
+# Connection pools, one per database, shared by every query helper
+DB_POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN_CONN', '1'))
+DB_POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX_CONN', '8'))
+connection_pools = {}
+connection_pools_lock = threading.Lock()
+
+# Seconds the clinic list and the database summary are reused before being
+# queried again; 0 disables the cache
+CLINICS_CACHE_TTL = float(os.getenv('CLINICS_CACHE_TTL', '60'))
+SUMMARY_CACHE_TTL = float(os.getenv('SUMMARY_CACHE_TTL', '30'))
+
+# Statements already prepared on each pooled connection (see execute_prepared)
+prepared_statements = weakref.WeakKeyDictionary()
+prepared_statements_lock = threading.Lock()
+
+# Channel the web service notifies on the admin database when it creates a
+# clinic database (see start_clinic_listener)
+CLINIC_CREATED_CHANNEL = 'clinic_created'
+clinic_listener = None
+clinic_listener_lock = threading.Lock()
+
+# Clinic databases queried concurrently by get_all_databases_summary (each
+# worker borrows from that clinic's own pool)
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', '16'))
+
+# GROUPING(appointment_status, practitioner, appointment_type) value of each
+# grouping set in the statistics query (a bit is set for every column not
+# grouped on), and how many practitioners and types the statistics rank
+STATISTICS_STATUS_FACET = 0b011
+STATISTICS_TOTAL_FACET = 0b111
+STATISTICS_FACETS = {
+    STATISTICS_STATUS_FACET: 'by_status',
+    0b101: 'top_practitioners',
+    0b110: 'top_types'
+}
+STATISTICS_TOP_N = 10
+
+# Text searched by search_appointments: the searchable columns joined with a
+# unit separator so a match can't straddle two of them. The query and the
+# trigram index must use this exact expression for the index to apply
+SEARCH_DOCUMENT_SQL = (
+    "coalesce(client, '') || E'\\x1f' || coalesce(practitioner, '') || E'\\x1f' || "
+    "coalesce(appointment_type, '') || E'\\x1f' || coalesce(business, '') || E'\\x1f' || "
+    "coalesce(clinical_note, '')"
+)
+
+# Columns print_appointment shows, in the order of the tuples the appointment
+# queries return when called with view=True
+APPOINTMENT_VIEW_COLUMNS = (
+    'appointment_id', 'appointment_date', 'client', 'client_id', 'practitioner',
+    'appointment_type', 'appointment_status', 'client_duration', 'business', 'clinical_note'
+)
+APPOINTMENT_VIEW_SQL = sql.SQL(', ').join(map(sql.Identifier, APPOINTMENT_VIEW_COLUMNS))
+
+# timestamp/timestamptz values left as the server's text; the viewer only
+# prints them, so building datetime objects would be wasted work
+TIMESTAMP_AS_TEXT = psycopg2.extensions.new_type((1114, 1184), 'TIMESTAMP_AS_TEXT', lambda value, cursor: value)
+
+# Upper bound on the rows get_all_appointments returns in one call
+MAX_APPOINTMENTS_LIMIT = int(os.getenv('MAX_APPOINTMENTS_LIMIT', '100000'))
+
 
 def get_db_connection(database_name: str = None):
-    """Get a connection to the specified database or admin database"""
+    """
+    Get a dedicated connection to the specified database or admin database
+    The caller owns and closes it; the query helpers use pooled connections (db_conn)
+    """
     db = database_name or DB_CONFIG['admin_db']
     return psycopg2.connect(
         host=DB_CONFIG['host'],
@@ -34,23 +110,120 @@ def get_db_connection(database_name: str = None):
     )
 
 
+def get_connection_pool(database_name: str = None):
+    """Get (creating on first use) the connection pool for a database"""
+    db = database_name or DB_CONFIG['admin_db']
+    pool = connection_pools.get(db)
+    if pool is None:
+        with connection_pools_lock:
+            pool = connection_pools.get(db)
+            if pool is None:
+                pool = ThreadedConnectionPool(
+                    DB_POOL_MIN_CONN,
+                    DB_POOL_MAX_CONN,
+                    host=DB_CONFIG['host'],
+                    port=DB_CONFIG['port'],
+                    user=DB_CONFIG['user'],
+                    password=DB_CONFIG['password'],
+                    database=db
+                )
+                connection_pools[db] = pool
+    return pool
+
+
+def close_connection_pools():
+    """Close every pooled connection"""
+    with connection_pools_lock:
+        for pool in connection_pools.values():
+            pool.closeall()
+        connection_pools.clear()
+
+
+atexit.register(close_connection_pools)
+
+
+@contextmanager
+def db_conn(database_name: str = None):
+    """
+    Borrow a pooled connection to the specified database or admin database
+    The connection is rolled back and returned to its pool on exit
+    """
+    pool = get_connection_pool(database_name)
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        discard = conn.closed
+        if not discard:
+            try:
+                conn.rollback()
+                conn.autocommit = False
+            except psycopg2.Error:
+                discard = True
+        pool.putconn(conn, close=discard)
+
+
+def execute_prepared(cursor, query, params: tuple):
+    """
+    Execute a query (with $1, $2, ... placeholders) as a server-side prepared
+    statement, preparing it the first time it runs on the cursor's connection
+    so later calls skip parsing and planning
+    """
+    text = query if isinstance(query, str) else query.as_string(cursor)
+    name = 'read_db_' + hashlib.sha1(text.encode()).hexdigest()[:16]
+    with prepared_statements_lock:
+        prepared = prepared_statements.setdefault(cursor.connection, set())
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {text}")
+        prepared.add(name)
+    cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+
+def ttl_cache(ttl: float):
+    """
+    Memoize a function's result per arguments for ttl seconds
+    Empty results (the helpers return one on error) are not cached; call
+    .cache_clear() on the wrapped function to force a refresh
+    """
+    def decorator(func):
+        cache = {}
+        lock = threading.Lock()
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            with lock:
+                entry = cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                return entry[1]
+            result = func(*args, **kwargs)
+            if result and ttl > 0:
+                with lock:
+                    cache[key] = (time.monotonic(), result)
+            return result
+        
+        def cache_clear():
+            with lock:
+                cache.clear()
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+
+@ttl_cache(CLINICS_CACHE_TTL)
 def list_all_clinics():
     """List all clinic databases (excluding system databases)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT datname 
-            FROM pg_database 
-            WHERE datname NOT IN ('postgres', 'template0', 'template1', 'railway')
-            ORDER BY datname
-        """)
-        
-        clinics = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
+        with db_conn() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT datname 
+                FROM pg_database 
+                WHERE datname NOT IN ('postgres', 'template0', 'template1', 'railway')
+                ORDER BY datname
+            """)
+            
+            clinics = [row[0] for row in cursor.fetchall()]
         
         return clinics
     except Exception as e:
@@ -58,32 +231,61 @@ def list_all_clinics():
         return []
 
 
+def listen_for_new_clinics():
+    """Clear the cached clinic list and summary each time a clinic database is created"""
+    try:
+        # A dedicated connection: it stays checked out for the process's lifetime
+        conn = get_db_connection()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(CLINIC_CREATED_CHANNEL)))
+        
+        while True:
+            # Wait for the server to deliver notifications, without polling
+            select.select([conn], [], [])
+            conn.poll()
+            if conn.notifies:
+                conn.notifies.clear()
+                list_all_clinics.cache_clear()
+                get_all_databases_summary.cache_clear()
+    except Exception as e:
+        # The caches still expire on their TTL without the listener
+        print(f"Error listening for new clinics: {e}")
+
+
+def start_clinic_listener():
+    """
+    Start (once) a background thread that keeps the cached clinic list fresh
+    Meant for long-running processes that call list_all_clinics repeatedly
+    """
+    global clinic_listener
+    with clinic_listener_lock:
+        if clinic_listener is None or not clinic_listener.is_alive():
+            clinic_listener = threading.Thread(target=listen_for_new_clinics, name='clinic-listener', daemon=True)
+            clinic_listener.start()
+
+
 def get_table_info(clinic_name: str, table_name: str = 'appointments'):
     """Get information about a table in a clinic database"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor()
-        
-        # Get column information
-        cursor.execute("""
-            SELECT 
-                column_name, 
-                data_type, 
-                character_maximum_length,
-                is_nullable
-            FROM information_schema.columns
-            WHERE table_name = %s
-            ORDER BY ordinal_position
-        """, (table_name,))
-        
-        columns = cursor.fetchall()
-        
-        # Get row count
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        row_count = cursor.fetchone()[0]
-        
-        cursor.close()
-        conn.close()
+        with db_conn(clinic_name) as conn, conn.cursor() as cursor:
+            # Get column information
+            cursor.execute("""
+                SELECT 
+                    column_name, 
+                    data_type, 
+                    character_maximum_length,
+                    is_nullable
+                FROM information_schema.columns
+                WHERE table_name = %s
+                ORDER BY ordinal_position
+            """, (table_name,))
+            
+            columns = cursor.fetchall()
+            
+            # Get row count
+            cursor.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(table_name)))
+            row_count = cursor.fetchone()[0]
         
         return {
             'columns': columns,
@@ -94,36 +296,39 @@ def get_table_info(clinic_name: str, table_name: str = 'appointments'):
         return None
 
 
-def list_all_tables_in_database(clinic_name: str):
-    """List all tables in a clinic database with row counts"""
+def list_all_tables_in_database(clinic_name: str, exact: bool = False):
+    """
+    List all tables in a clinic database with row counts
+    Counts are the planner's estimates unless exact=True (COUNT(*) of every table)
+    """
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor()
-        
-        # Get all tables in the public schema
-        cursor.execute("""
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_schema = 'public'
-            AND table_type = 'BASE TABLE'
-            ORDER BY table_name
-        """)
-        
-        tables = []
-        for row in cursor.fetchall():
-            table_name = row[0]
+        with db_conn(clinic_name) as conn, conn.cursor() as cursor:
+            # Get all tables in the public schema with their estimated row
+            # counts in one query; reltuples is -1 until a table is first analyzed
+            cursor.execute("""
+                SELECT c.relname, c.reltuples::bigint
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public'
+                AND c.relkind = 'r'
+                ORDER BY c.relname
+            """)
             
-            # Get row count for each table
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            row_count = cursor.fetchone()[0]
+            tables = [
+                {'table_name': table_name, 'row_count': row_count}
+                for table_name, row_count in cursor.fetchall()
+            ]
             
-            tables.append({
-                'table_name': table_name,
-                'row_count': row_count
-            })
-        
-        cursor.close()
-        conn.close()
+            # Get exact row counts where needed, every table in one round trip
+            # (one scalar COUNT(*) subquery per table)
+            counted = [table for table in tables if exact or table['row_count'] < 0]
+            if counted:
+                cursor.execute(sql.SQL("SELECT {}").format(sql.SQL(', ').join(
+                    sql.SQL("(SELECT COUNT(*) FROM {})").format(sql.Identifier(table['table_name']))
+                    for table in counted
+                )))
+                for table, row_count in zip(counted, cursor.fetchone()):
+                    table['row_count'] = row_count
         
         return tables
     except Exception as e:
@@ -131,14 +336,20 @@ def list_all_tables_in_database(clinic_name: str):
         return []
 
 
-def get_all_databases_summary():
+@ttl_cache(SUMMARY_CACHE_TTL)
+def get_all_databases_summary(exact: bool = False):
     """Get a summary of all clinic databases with table and row counts"""
     try:
         clinics = list_all_clinics()
         summary = []
+        if not clinics:
+            return summary
+        
+        # Query every clinic database at once; results keep the clinic order
+        with ThreadPoolExecutor(max_workers=min(SUMMARY_WORKERS, len(clinics))) as executor:
+            clinic_tables = list(executor.map(lambda clinic: list_all_tables_in_database(clinic, exact), clinics))
         
-        for clinic_name in clinics:
-            tables = list_all_tables_in_database(clinic_name)
+        for clinic_name, tables in zip(clinics, clinic_tables):
             total_rows = sum(table['row_count'] for table in tables)
             
             summary.append({
@@ -154,22 +365,38 @@ def get_all_databases_summary():
         return []
 
 
-def get_all_appointments(clinic_name: str, limit: int = 100):
+class AppointmentViewCursor(psycopg2.extensions.cursor):
+    """Tuple cursor for the appointment viewer, returning timestamps as text"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        psycopg2.extensions.register_type(TIMESTAMP_AS_TEXT, self)
+
+
+def appointment_projection(view: bool):
+    """
+    Select list and cursor factory for the appointment queries: every column
+    as a dict per row, or with view=True just APPOINTMENT_VIEW_COLUMNS as tuples
+    (with appointment_date as text)
+    """
+    if view:
+        return APPOINTMENT_VIEW_SQL, AppointmentViewCursor
+    return sql.SQL('*'), RealDictCursor
+
+
+def get_all_appointments(clinic_name: str, limit: int = 100, view: bool = False):
     """Get all appointments from a clinic database"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute(f"""
-            SELECT * FROM appointments 
-            ORDER BY appointment_date DESC 
-            LIMIT {limit}
-        """)
-        
-        appointments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        columns, cursor_factory = appointment_projection(view)
+        with db_conn(clinic_name) as conn, conn.cursor(cursor_factory=cursor_factory) as cursor:
+            # Bind the limit rather than formatting it in, and keep it in range
+            execute_prepared(cursor, sql.SQL("""
+                SELECT {} FROM appointments 
+                ORDER BY appointment_date DESC 
+                LIMIT $1
+            """).format(columns), (min(max(int(limit), 0), MAX_APPOINTMENTS_LIMIT),))
+            
+            appointments = cursor.fetchall()
         
         return appointments
     except Exception as e:
@@ -177,29 +404,25 @@ def get_all_appointments(clinic_name: str, limit: int = 100):
         return []
 
 
-def get_appointments_by_date(clinic_name: str, start_date: str, end_date: str = None):
+def get_appointments_by_date(clinic_name: str, start_date: str, end_date: str = None, view: bool = False):
     """Get appointments within a date range"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        if end_date:
-            cursor.execute("""
-                SELECT * FROM appointments 
-                WHERE appointment_date BETWEEN %s AND %s
-                ORDER BY appointment_date
-            """, (start_date, end_date))
-        else:
-            cursor.execute("""
-                SELECT * FROM appointments 
-                WHERE appointment_date >= %s
-                ORDER BY appointment_date
-            """, (start_date,))
-        
-        appointments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        columns, cursor_factory = appointment_projection(view)
+        with db_conn(clinic_name) as conn, conn.cursor(cursor_factory=cursor_factory) as cursor:
+            if end_date:
+                execute_prepared(cursor, sql.SQL("""
+                    SELECT {} FROM appointments 
+                    WHERE appointment_date BETWEEN $1 AND $2
+                    ORDER BY appointment_date
+                """).format(columns), (start_date, end_date))
+            else:
+                execute_prepared(cursor, sql.SQL("""
+                    SELECT {} FROM appointments 
+                    WHERE appointment_date >= $1
+                    ORDER BY appointment_date
+                """).format(columns), (start_date,))
+            
+            appointments = cursor.fetchall()
         
         return appointments
     except Exception as e:
@@ -207,22 +430,18 @@ def get_appointments_by_date(clinic_name: str, start_date: str, end_date: str =
         return []
 
 
-def get_appointments_by_client(clinic_name: str, client_name: str):
+def get_appointments_by_client(clinic_name: str, client_name: str, view: bool = False):
     """Get all appointments for a specific client"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("""
-            SELECT * FROM appointments 
-            WHERE client ILIKE %s
-            ORDER BY appointment_date DESC
-        """, (f'%{client_name}%',))
-        
-        appointments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        columns, cursor_factory = appointment_projection(view)
+        with db_conn(clinic_name) as conn, conn.cursor(cursor_factory=cursor_factory) as cursor:
+            execute_prepared(cursor, sql.SQL("""
+                SELECT {} FROM appointments 
+                WHERE client ILIKE '%' || $1 || '%'
+                ORDER BY appointment_date DESC
+            """).format(columns), (client_name,))
+            
+            appointments = cursor.fetchall()
         
         return appointments
     except Exception as e:
@@ -230,22 +449,18 @@ def get_appointments_by_client(clinic_name: str, client_name: str):
         return []
 
 
-def get_appointments_by_practitioner(clinic_name: str, practitioner_name: str):
+def get_appointments_by_practitioner(clinic_name: str, practitioner_name: str, view: bool = False):
     """Get all appointments for a specific practitioner"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("""
-            SELECT * FROM appointments 
-            WHERE practitioner ILIKE %s
-            ORDER BY appointment_date DESC
-        """, (f'%{practitioner_name}%',))
-        
-        appointments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        columns, cursor_factory = appointment_projection(view)
+        with db_conn(clinic_name) as conn, conn.cursor(cursor_factory=cursor_factory) as cursor:
+            execute_prepared(cursor, sql.SQL("""
+                SELECT {} FROM appointments 
+                WHERE practitioner ILIKE '%' || $1 || '%'
+                ORDER BY appointment_date DESC
+            """).format(columns), (practitioner_name,))
+            
+            appointments = cursor.fetchall()
         
         return appointments
     except Exception as e:
@@ -256,58 +471,50 @@ def get_appointments_by_practitioner(clinic_name: str, practitioner_name: str):
 def get_appointment_statistics(clinic_name: str):
     """Get statistics about appointments in a clinic"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Total appointments
-        cursor.execute("SELECT COUNT(*) FROM appointments")
-        stats['total_appointments'] = cursor.fetchone()[0]
-        
-        # Appointments by status
-        cursor.execute("""
-            SELECT appointment_status, COUNT(*) 
-            FROM appointments 
-            GROUP BY appointment_status
-        """)
-        stats['by_status'] = dict(cursor.fetchall())
-        
-        # Appointments by practitioner
-        cursor.execute("""
-            SELECT practitioner, COUNT(*) 
-            FROM appointments 
-            GROUP BY practitioner
-            ORDER BY COUNT(*) DESC
-            LIMIT 10
-        """)
-        stats['top_practitioners'] = dict(cursor.fetchall())
-        
-        # Appointments by type
-        cursor.execute("""
-            SELECT appointment_type, COUNT(*) 
-            FROM appointments 
-            GROUP BY appointment_type
-            ORDER BY COUNT(*) DESC
-            LIMIT 10
-        """)
-        stats['top_types'] = dict(cursor.fetchall())
-        
-        # Date range
-        cursor.execute("""
-            SELECT 
-                MIN(appointment_date) as earliest,
-                MAX(appointment_date) as latest
-            FROM appointments
-        """)
-        date_range = cursor.fetchone()
-        stats['date_range'] = {
-            'earliest': date_range[0],
-            'latest': date_range[1]
+        with db_conn(clinic_name) as conn, conn.cursor() as cursor:
+            # Every statistic from a single scan: one grouping set per facet
+            # (status, practitioner, type) plus the grand total, told apart
+            # by the GROUPING() bitmask. Facets come back ranked by count and
+            # the top-N cut is made server-side, except for status (all kept)
+            cursor.execute("""
+                SELECT facet, value, count, earliest, latest
+                FROM (
+                    SELECT 
+                        GROUPING(appointment_status, practitioner, appointment_type) as facet,
+                        COALESCE(appointment_status, practitioner, appointment_type) as value,
+                        COUNT(*) as count,
+                        MIN(appointment_date) as earliest,
+                        MAX(appointment_date) as latest,
+                        row_number() OVER (
+                            PARTITION BY GROUPING(appointment_status, practitioner, appointment_type)
+                            ORDER BY COUNT(*) DESC
+                        ) as rank
+                    FROM appointments
+                    GROUP BY GROUPING SETS (
+                        (appointment_status), (practitioner), (appointment_type), ()
+                    )
+                ) facets
+                WHERE rank <= %s OR facet IN %s
+                ORDER BY facet, rank
+            """, (STATISTICS_TOP_N, (STATISTICS_STATUS_FACET, STATISTICS_TOTAL_FACET)))
+            rows = cursor.fetchall()
+        
+        stats = {
+            'total_appointments': 0,
+            'by_status': {},
+            'top_practitioners': {},
+            'top_types': {}
         }
-        
-        cursor.close()
-        conn.close()
+        for facet, value, count, earliest, latest in rows:
+            if facet == STATISTICS_TOTAL_FACET:
+                # Total appointments and date range
+                stats['total_appointments'] = count
+                stats['date_range'] = {
+                    'earliest': earliest,
+                    'latest': latest
+                }
+            else:
+                stats[STATISTICS_FACETS[facet]][value] = count
         
         return stats
     except Exception as e:
@@ -315,28 +522,21 @@ def get_appointment_statistics(clinic_name: str):
         return {}
 
 
-def search_appointments(clinic_name: str, search_term: str):
+def search_appointments(clinic_name: str, search_term: str, view: bool = False):
     """Search appointments across multiple fields"""
     try:
-        conn = get_db_connection(clinic_name)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("""
-            SELECT * FROM appointments 
-            WHERE 
-                client ILIKE %s OR
-                practitioner ILIKE %s OR
-                appointment_type ILIKE %s OR
-                business ILIKE %s OR
-                clinical_note ILIKE %s
-            ORDER BY appointment_date DESC
-            LIMIT 100
-        """, tuple([f'%{search_term}%'] * 5))
-        
-        appointments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        columns, cursor_factory = appointment_projection(view)
+        with db_conn(clinic_name) as conn, conn.cursor(cursor_factory=cursor_factory) as cursor:
+            # One ILIKE over all searched columns, which the trigram index
+            # from create_indexes() can serve
+            execute_prepared(cursor, sql.SQL("""
+                SELECT {} FROM appointments 
+                WHERE ({}) ILIKE '%' || $1 || '%'
+                ORDER BY appointment_date DESC
+                LIMIT 100
+            """).format(columns, sql.SQL(SEARCH_DOCUMENT_SQL)), (search_term,))
+            
+            appointments = cursor.fetchall()
         
         return appointments
     except Exception as e:
@@ -344,11 +544,87 @@ def search_appointments(clinic_name: str, search_term: str):
         return []
 
 
+def create_indexes(clinic_name: str):
+    """
+    Create the indexes the read queries rely on in a clinic database
+    Needs the pg_trgm extension (created if missing). Indexes are built
+    concurrently so the web service can keep writing meanwhile
+    """
+    try:
+        with db_conn(clinic_name) as conn, conn.cursor() as cursor:
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            conn.autocommit = True
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            
+            # Trigram indexes for the substring searches: search_appointments'
+            # combined columns, and the client and practitioner lookups
+            cursor.execute(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_search
+                ON appointments USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)
+            """)
+            cursor.execute("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_client_trgm
+                ON appointments USING gin (client gin_trgm_ops)
+            """)
+            cursor.execute("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_practitioner_trgm
+                ON appointments USING gin (practitioner gin_trgm_ops)
+            """)
+        
+        print(f"Indexes created in database '{clinic_name}'")
+        return True
+    except Exception as e:
+        print(f"Error creating indexes in database '{clinic_name}': {e}")
+        return False
+
+
 def export_to_json(data, filename: str):
     """Export data to JSON file"""
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, default=str)
+        # orjson writes datetimes natively; default=str still covers Decimal
+        # (NUMERIC columns), and statistics dicts can have None keys
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        print(f"Data exported to: {filename}")
+        return True
+    except Exception as e:
+        print(f"Error exporting to JSON: {e}")
+        return False
+
+
+def export_appointments_to_json(clinic_name: str, filename: str, limit: int = 10000):
+    """
+    Export the most recent appointments of a clinic to a JSON file
+    PostgreSQL renders each row as JSON and COPY streams the text straight
+    into the file, so rows never become Python objects
+    """
+    try:
+        with db_conn(clinic_name) as conn, conn.cursor() as cursor:
+            # COPY takes no bind parameters, so inline the limit safely. The
+            # LIMIT sits in the innermost query so only those rows are read and
+            # numbered, rather than the whole table
+            query = cursor.mogrify("""
+                COPY (
+                    SELECT CASE WHEN n = 1 THEN '' ELSE ',' END || row_to_json(t.a)::text
+                    FROM (
+                        SELECT a, row_number() OVER (ORDER BY a.appointment_date DESC) as n
+                        FROM (
+                            SELECT * FROM appointments
+                            ORDER BY appointment_date DESC
+                            LIMIT %s
+                        ) a
+                    ) t
+                    ORDER BY n
+                ) TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')
+            """, (int(limit),))
+            
+            # One JSON array with a row per line; the CSV quote and delimiter
+            # are control characters JSON always escapes, so the text is
+            # copied out unchanged
+            with open(filename, 'wb') as f:
+                f.write(b'[\n')
+                cursor.copy_expert(query, f)
+                f.write(b']\n')
         print(f"Data exported to: {filename}")
         return True
     except Exception as e:
@@ -357,7 +633,9 @@ def export_to_json(data, filename: str):
 
 
 def print_appointment(appointment):
-    """Pretty print a single appointment"""
+    """Pretty print a single appointment (a dict row, or a tuple fetched with view=True)"""
+    if not isinstance(appointment, dict):
+        appointment = dict(zip(APPOINTMENT_VIEW_COLUMNS, appointment))
     print("\n" + "="*80)
     print(f"Appointment ID: {appointment.get('appointment_id')}")
     print(f"Date: {appointment.get('appointment_date')}")
@@ -451,14 +729,15 @@ def main():
         # Get recent appointments
         print(f"\n\nRecent Appointments (last 3):")
         print("-" * 80)
-        appointments = get_all_appointments(clinic_name, limit=3)
+        appointments = get_all_appointments(clinic_name, limit=3, view=True)
         if appointments:
             for appointment in appointments:
                 print_appointment(appointment)
             
             # Export to JSON
             print(f"\n[EXPORT] Saving sample to JSON...")
-            export_to_json(appointments, f'appointments_{clinic_name}_sample.json')
+            sample = [dict(zip(APPOINTMENT_VIEW_COLUMNS, appointment)) for appointment in appointments]
+            export_to_json(sample, f'appointments_{clinic_name}_sample.json')
         else:
             print("  No appointments found.")
     
@@ -511,21 +790,21 @@ def interactive_mode():
             if option == '0':
                 break
             elif option == '1':
-                appointments = get_all_appointments(clinic_name, limit=10)
+                appointments = get_all_appointments(clinic_name, limit=10, view=True)
                 print(f"\nFound {len(appointments)} appointments:")
                 for apt in appointments:
                     print_appointment(apt)
             
             elif option == '2':
                 client_name = input("Enter client name: ")
-                appointments = get_appointments_by_client(clinic_name, client_name)
+                appointments = get_appointments_by_client(clinic_name, client_name, view=True)
                 print(f"\nFound {len(appointments)} appointments for '{client_name}':")
                 for apt in appointments:
                     print_appointment(apt)
             
             elif option == '3':
                 practitioner_name = input("Enter practitioner name: ")
-                appointments = get_appointments_by_practitioner(clinic_name, practitioner_name)
+                appointments = get_appointments_by_practitioner(clinic_name, practitioner_name, view=True)
                 print(f"\nFound {len(appointments)} appointments for '{practitioner_name}':")
                 for apt in appointments:
                     print_appointment(apt)
@@ -533,7 +812,7 @@ def interactive_mode():
             elif option == '4':
                 start_date = input("Enter start date (YYYY-MM-DD): ")
                 end_date = input("Enter end date (YYYY-MM-DD) or press Enter for all after start: ")
-                appointments = get_appointments_by_date(clinic_name, start_date, end_date if end_date else None)
+                appointments = get_appointments_by_date(clinic_name, start_date, end_date if end_date else None, view=True)
                 print(f"\nFound {len(appointments)} appointments:")
                 for apt in appointments:
                     print_appointment(apt)
@@ -545,15 +824,14 @@ def interactive_mode():
             
             elif option == '6':
                 search_term = input("Enter search term: ")
-                appointments = search_appointments(clinic_name, search_term)
+                appointments = search_appointments(clinic_name, search_term, view=True)
                 print(f"\nFound {len(appointments)} appointments matching '{search_term}':")
                 for apt in appointments:
                     print_appointment(apt)
             
             elif option == '7':
-                appointments = get_all_appointments(clinic_name, limit=10000)
                 filename = f'appointments_{clinic_name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-                export_to_json(appointments, filename)
+                export_appointments_to_json(clinic_name, filename, limit=10000)
             
             else:
                 print("Invalid option. Please try again.")
@@ -569,6 +847,9 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == '--interactive':
         interactive_mode()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--create-indexes':
+        for clinic in list_all_clinics():
+            create_indexes(clinic)
     else:
         main()
         print("\nTip: Run 'python read_db.py --interactive' for interactive query mode")